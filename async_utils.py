@@ -0,0 +1,28 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs a coroutine to completion from synchronous code and returns its result.
+
+    asyncio.run cannot be called while an event loop is already running in this thread (e.g. in a
+    Jupyter notebook or from a coroutine), so in that case the coroutine is run on its own event loop
+    in a worker thread. The caller blocks until it finishes, like any other synchronous call.
+
+    Args:
+        coro (Coroutine): The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
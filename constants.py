@@ -1,4 +1,4 @@
-GENERAL_FILE_EXTENSIONS = [
+GENERAL_FILE_EXTENSIONS = frozenset([
     # Shell scripts
     ".sh",
     ".bash",
@@ -19,19 +19,19 @@ GENERAL_FILE_EXTENSIONS = [
     ".yaml",
     ".yml",
     ".json",
-]
+])
 
-FULL_FILES = [
+FULL_FILES = frozenset([
     "Dockerfile"
-]
+])
 
-SOURCE_FILE_EXTENSIONS = [
+SOURCE_FILE_EXTENSIONS = frozenset([
     # Python
     ".py",
 
     # JavaScript
     ".js",
-    ".jsx"
+    ".jsx",
 
     # TypeScript
     ".ts",
@@ -53,9 +53,16 @@ SOURCE_FILE_EXTENSIONS = [
     # Scala
     ".scala",
     ".sc",
-]
+])
 
-IGNORE_FILE_EXTENSIONS = [
+IGNORE_FILE_EXTENSIONS = frozenset([
     ".min.js",
     ".bundle.js",
-]
+])
+
+TEST_DIRS = frozenset([
+    "test",
+    "tests",
+    "spec",
+    "specs",
+])
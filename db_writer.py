@@ -3,88 +3,173 @@ from pymilvus.model.dense import SentenceTransformerEmbeddingFunction, OpenAIEmb
 
 from processing import read_output
 from models import ExtendedFunctionDescription, ExtendedFileDescription
-from typing import List
+from embedding_cache import get_or_compute
+from async_utils import run_sync
+from typing import List, Any, Callable, Iterable
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import partial, lru_cache
+import asyncio
+import sys
+import numpy as np
+
+INSERT_CHUNK = 1000
+
+# Task prefixes expected by the nomic embedding model
+DOCUMENT_PREFIX = "search_document: "
+QUERY_PREFIX = "search_query: "
 
 def get_milvus_client(db_name: str) -> MilvusClient:
     """Sets up and returns a Milvus client."""
     return MilvusClient(db_name)
 
 def setup_milvus_collection(client: MilvusClient, collection_name: str, dimension: int):
-    """Sets up the Milvus collection, dropping it if it already exists."""
+    """
+    Sets up the Milvus collection, dropping it if it already exists. Primary keys are generated by
+    Milvus so inserts are not tied to a single client-side id sequence.
+    """
     if client.has_collection(collection_name=collection_name):
         client.drop_collection(collection_name=collection_name)
 
     client.create_collection(
         collection_name=collection_name,
         dimension=dimension,
+        auto_id=True,
     )
 
 
-def insert_function_descriptions(client: MilvusClient, collection_name: str, docs: List[ExtendedFunctionDescription], embedding_fn):
+def _function_row(vector, text: str, doc: ExtendedFunctionDescription) -> dict:
+    qualified_name = f"{doc.class_name}.{doc.function_name}" if doc.class_name else doc.function_name
+    return {"doc_uid": f"{doc.repo_name}:{doc.filepath}:{qualified_name}",
+            "vector": vector,
+            "text": text,
+            "function_name": doc.function_name,
+            "class_name": doc.class_name,
+            "tags": ",".join(doc.tags),
+            "repo_name": doc.repo_name,
+            "filepath": doc.filepath,
+            "return_type": doc.return_type,
+            "functionality": doc.functionality,
+            }
+
+
+def _file_row(vector, text: str, doc: ExtendedFileDescription) -> dict:
+    return {"doc_uid": f"{doc.repo_name}:{doc.filepath}",
+            "vector": vector,
+            "text": text,
+            "repo_name": doc.repo_name,
+            "filepath": doc.filepath,
+            "overall_purpose_and_domain": doc.overall_purpose_and_domain,
+            "primary_responsibilities": "\n".join(doc.primary_responsibilities),
+            "tags": ",".join(doc.tags),
+            }
+
+
+def _discard(futures: Iterable[asyncio.Future]):
+    """
+    Cancels futures that are no longer needed after an error. Futures that have already failed get
+    their exception retrieved, so asyncio does not report each of them as never retrieved.
+    """
+    for future in futures:
+        if not future.cancel() and not future.cancelled():
+            future.exception()
+
+
+async def _encode_and_insert(client: MilvusClient, collection_name: str, docs: List, embedding_fn, to_row: Callable[[Any, str, Any], dict],
+                             batch_size: int = 64, max_workers: int = 8, insert_workers: int = 4, queue_size: int = 4):
+    """
+    Encodes documents and inserts them into the Milvus collection as a producer/consumer pipeline,
+    so that inserting finished batches overlaps with encoding the following ones.
+
+    The producer keeps up to `max_workers` encode calls in flight, skipping texts already present in
+    the embedding cache, and hands encoded batches over in input order; the consumer turns them into
+    rows and inserts them in chunks of INSERT_CHUNK with up to `insert_workers` inserts in flight.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def producer(executor: ThreadPoolExecutor):
+        pending = deque()
+        try:
+            for start in range(0, len(docs), batch_size):
+                batch_docs = docs[start:start+batch_size]
+                texts = [d.to_vector_string() for d in batch_docs]
+                prompts = [DOCUMENT_PREFIX + t for t in texts]
+                pending.append((start, batch_docs, texts, loop.run_in_executor(executor, get_or_compute, prompts, embedding_fn.encode_documents, embedding_fn.model_name)))
+                if len(pending) >= max_workers:
+                    batch_start, batch_docs, texts, vectors = pending.popleft()
+                    await queue.put((batch_start, batch_docs, texts, await vectors))
+            while pending:
+                batch_start, batch_docs, texts, vectors = pending.popleft()
+                await queue.put((batch_start, batch_docs, texts, await vectors))
+            await queue.put(None)
+        finally:
+            _discard(vectors for *_, vectors in pending)
+
+    async def consumer(executor: ThreadPoolExecutor):
+        pending = deque()
+        rows = []
+
+        def flush(chunk: List[dict]):
+            pending.append(loop.run_in_executor(executor, partial(client.insert, collection_name=collection_name, data=chunk)))
+
+        try:
+            with tqdm(total=len(docs), desc=f"Loading into {collection_name}") as progress:
+                while (item := await queue.get()) is not None:
+                    batch_start, batch_docs, texts, vectors = item
+                    # One contiguous float32 array per batch; each row references a view into it
+                    vec_arr = np.asarray(vectors, dtype=np.float32)
+                    rows.extend(to_row(vector, text, doc) for vector, text, doc in zip(vec_arr, texts, batch_docs))
+                    if batch_start == 0 and rows:
+                        print("Data has", len(docs), "entities, each with fields: ", rows[0].keys())
+                        print("Vector dim:", len(rows[0]["vector"]))
+                    while len(rows) >= INSERT_CHUNK:
+                        flush(rows[:INSERT_CHUNK])
+                        del rows[:INSERT_CHUNK]
+                    while len(pending) > insert_workers:
+                        await pending.popleft()
+                    progress.update(len(batch_docs))
+                if rows:
+                    flush(rows)
+                while pending:
+                    await pending.popleft()
+        finally:
+            _discard(pending)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as encode_executor, ThreadPoolExecutor(max_workers=insert_workers) as insert_executor:
+        tasks = [asyncio.ensure_future(producer(encode_executor)), asyncio.ensure_future(consumer(insert_executor))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # If one side failed, stop the other one as well so neither waits on the queue forever
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def insert_function_descriptions(client: MilvusClient, collection_name: str, docs: List[ExtendedFunctionDescription], embedding_fn, max_workers: int = 8):
     """Encodes documents and inserts them into the Milvus collection."""
-    batch_size = 64
-    vectors = []
-    for i in tqdm(list(range(0, len(docs), batch_size)), desc="Encoding function descriptions"):
-        batch_docs = docs[i:i+batch_size]
-        vectors.extend(embedding_fn.encode_documents([f"search_document: {d.to_vector_string()}" for d in batch_docs]))
-
-
-    data = [
-        {"id": i,
-         "vector": vectors[i],
-         "text": docs[i].to_vector_string(),
-         "function_name": docs[i].function_name,
-         "class_name": docs[i].class_name,
-         "tags": ",".join(docs[i].tags),
-         "repo_name": docs[i].repo_name,
-         "filepath": docs[i].filepath,
-         "return_type": docs[i].return_type,
-         "functionality": docs[i].functionality,
-        }
-        for i in range(len(docs))
-    ]
-
-    print("Data has", len(data), "entities, each with fields: ", data[0].keys())
-    print("Vector dim:", len(data[0]["vector"]))
-
-    client.insert(collection_name=collection_name, data=data)
+    run_sync(_encode_and_insert(client, collection_name, docs, embedding_fn, _function_row, max_workers=max_workers))
 
     print(f'Finished loading function descriptions')
 
-def insert_file_descriptions(client: MilvusClient, collection_name: str, docs: List[ExtendedFileDescription], embedding_fn):
+def insert_file_descriptions(client: MilvusClient, collection_name: str, docs: List[ExtendedFileDescription], embedding_fn, max_workers: int = 8):
     """Encodes documents and inserts them into the Milvus collection."""
-    batch_size = 64
-    vectors = []
-    for i in tqdm(list(range(0, len(docs), batch_size)), desc="Encoding file descriptions"):
-        batch_docs = docs[i:i+batch_size]
-        vectors.extend(embedding_fn.encode_documents([f"search_document: {d.to_vector_string()}" for d in batch_docs]))
-
-
-    data = [
-        {"id": i,
-         "vector": vectors[i],
-         "text": docs[i].to_vector_string(),
-         "repo_name": docs[i].repo_name,
-         "filepath": docs[i].filepath,
-         "overall_purpose_and_domain": docs[i].overall_purpose_and_domain,
-         "primary_responsibilities": "\n".join(docs[i].primary_responsibilities),
-         "tags": ",".join(docs[i].tags),
-        }
-        for i in range(len(docs))
-    ]
-
-    print("Data has", len(data), "entities, each with fields: ", data[0].keys())
-    print("Vector dim:", len(data[0]["vector"]))
-
-    client.insert(collection_name=collection_name, data=data)
+    run_sync(_encode_and_insert(client, collection_name, docs, embedding_fn, _file_row, max_workers=max_workers))
 
     print(f'Finished loading file descriptions')
 
 
+@lru_cache(maxsize=256)
+def _encode_query(embedding_fn, query: str) -> tuple:
+    """Encodes a search query, memoized so repeated queries skip the embedding call."""
+    return tuple(embedding_fn.encode_queries([QUERY_PREFIX + query])[0])
+
+
 def search_collection(client: MilvusClient, collection_name: str, query: str, embedding_fn, limit: int = 5):
     """Performs a search on the Milvus collection."""
-    query_vectors = embedding_fn.encode_queries([f"search_query: {query}"])
+    query_vectors = [np.array(_encode_query(embedding_fn, query))]
 
     res = client.search(
         collection_name=collection_name,
@@ -92,9 +177,10 @@ def search_collection(client: MilvusClient, collection_name: str, query: str, em
         limit=limit,
         output_fields=["text", "class_name", "function_name", "filepath"],
     )
-    for r in res[0]:
-        print(r)
-        print("\n\n")
+    # Each hit is followed by the same blank lines as print(r); print("\n\n") would produce, but
+    # the whole result is written in one call
+    sys.stdout.write("".join(f"{r}\n\n\n\n" for r in res[0]))
+    sys.stdout.flush()
 
 def write_data_to_milvus(client: MilvusClient, function_desc_collection: str, file_desc_collection: str, embedding_fn):
     """Reads output and writes data to Milvus collections."""
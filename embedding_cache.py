@@ -0,0 +1,62 @@
+import hashlib
+import sqlite3
+from typing import Callable, Dict, List
+
+import numpy as np
+
+CACHE_PATH = "embedding_cache.db"
+
+# SQLite limits the number of host parameters in a single statement
+_MAX_PARAMS = 500
+
+
+def _connect(cache_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(cache_path, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, dim INT, vec BLOB)")
+    return conn
+
+
+def get_or_compute(texts: List[str], embed_fn: Callable[[List[str]], List], model: str, cache_path: str = CACHE_PATH) -> List[np.ndarray]:
+    """
+    Returns embeddings for the given texts, only calling `embed_fn` for texts that are not cached yet.
+
+    Vectors are keyed by the SHA-256 of the model name and the text and stored as float32, so switching
+    embedding models never returns vectors produced by a different model.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        embed_fn (Callable[[List[str]], List]): Function that embeds a list of texts, e.g. `encode_documents`.
+        model (str): The name of the embedding model behind `embed_fn`.
+        cache_path (str): Path to the SQLite cache file.
+
+    Returns:
+        List[np.ndarray]: One float32 vector per input text, in input order.
+    """
+    hashes = [hashlib.sha256(f"{model}\0{text}".encode()).hexdigest() for text in texts]
+    cached: Dict[str, np.ndarray] = {}
+
+    conn = _connect(cache_path)
+    try:
+        unique_hashes = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique_hashes), _MAX_PARAMS):
+            chunk = unique_hashes[i:i+_MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for h, vec in rows:
+                cached[h] = np.frombuffer(vec, dtype=np.float32)
+
+        missing = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            new_rows = []
+            for h, vec in zip(missing.keys(), vectors):
+                vec = np.asarray(vec, dtype=np.float32)
+                cached[h] = vec
+                new_rows.append((h, len(vec), vec.tobytes()))
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (hash, dim, vec) VALUES (?, ?, ?)", new_rows)
+    finally:
+        conn.close()
+
+    return [cached[h] for h in hashes]
@@ -1,8 +1,15 @@
 import os
-from typing import List
-from constants import GENERAL_FILE_EXTENSIONS, SOURCE_FILE_EXTENSIONS, FULL_FILES, IGNORE_FILE_EXTENSIONS
+from typing import List, Iterator, Tuple
+from constants import GENERAL_FILE_EXTENSIONS, SOURCE_FILE_EXTENSIONS, FULL_FILES, IGNORE_FILE_EXTENSIONS, TEST_DIRS
 from pydantic import BaseModel
 
+# str.endswith takes a tuple, which also covers compound extensions like .min.js
+_IGNORE_SUFFIXES = tuple(IGNORE_FILE_EXTENSIONS)
+
+# Maps a file extension to the SourceFiles bucket it belongs to
+EXT_BUCKET = {ext: "general" for ext in GENERAL_FILE_EXTENSIONS}
+EXT_BUCKET.update({ext: "source" for ext in SOURCE_FILE_EXTENSIONS})
+
 class SourceFiles(BaseModel):
     general_files: List[str]
     source_files: List[str]
@@ -13,26 +20,54 @@ def read_codefile(filename: str)->str:
     with open(filename, 'r', encoding='utf-8') as f:
         return f.read()
 
-def read_source_files(src_dir: str) -> SourceFiles:
-    general_files = []
-    source_files = []
-    full_files = []
-    for root, _, files in os.walk(src_dir):
-        if any(part.lower() in ["test", "tests", "spec", "specs"] for part in root.split(os.sep)):
-            print(f"Skipping directory {root} as it appears to be a test directory.")
+def iter_files(src_dir: str) -> Iterator[str]:
+    """
+    Recursively yields the paths of all files under `src_dir` using `os.scandir`, skipping
+    directories that appear to be test directories. Files of a directory are yielded before
+    descending into its subdirectories.
+    """
+    subdirs = []
+    try:
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.lower() in TEST_DIRS:
+                        print(f"Skipping directory {entry.path} as it appears to be a test directory.")
+                        continue
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+    except OSError as e:
+        print(f"Error reading directory {src_dir}: {e}")
+        return
+    for subdir in subdirs:
+        yield from iter_files(subdir)
+
+def iter_classified_files(src_dir: str) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily yields (bucket, file_path) pairs for the files under `src_dir`, where bucket is one of
+    "general", "source" or "full". Ignored and unrecognized files are not yielded.
+    """
+    for file_path in iter_files(src_dir):
+        # for extensions like .min.js
+        if file_path.endswith(_IGNORE_SUFFIXES):
+            print(f"Skipping file {file_path} due to ignored extension.")
             continue
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_name = os.path.basename(file_path)
-            # for extensions like .min.js
-            if any(file_path.endswith(ext) for ext in IGNORE_FILE_EXTENSIONS):
-                print(f"Skipping file {file_path} due to ignored extension.")
-                continue
-            file_extension = os.path.splitext(file_path)[1]
-            if file_extension in GENERAL_FILE_EXTENSIONS:
-                general_files.append(file_path)
-            elif file_extension in SOURCE_FILE_EXTENSIONS:
-                source_files.append(file_path)
-            elif file_name in FULL_FILES:
-                full_files.append(file_path)
-    return SourceFiles(general_files=general_files, source_files=source_files, full_files=full_files)
+        file_name = os.path.basename(file_path)
+        bucket = EXT_BUCKET.get(os.path.splitext(file_name)[1])
+        if bucket is None and file_name in FULL_FILES:
+            bucket = "full"
+        if bucket is not None:
+            yield bucket, file_path
+
+def iter_source_files(src_dir: str) -> Iterator[str]:
+    """
+    Lazily yields the source files under `src_dir` while the directory tree is being walked.
+    """
+    return (file_path for bucket, file_path in iter_classified_files(src_dir) if bucket == "source")
+
+def read_source_files(src_dir: str) -> SourceFiles:
+    buckets = {"general": [], "source": [], "full": []}
+    for bucket, file_path in iter_classified_files(src_dir):
+        buckets[bucket].append(file_path)
+    return SourceFiles(general_files=buckets["general"], source_files=buckets["source"], full_files=buckets["full"])
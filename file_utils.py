@@ -0,0 +1,37 @@
+import os
+import stat
+import tempfile
+
+
+def _target_mode(path: str) -> int:
+    """
+    Returns the permission bits for a file written to `path`: those of the existing file, or the
+    default for a new file under the current umask.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path: str, payload: str):
+    """
+    Writes `payload` to `path` atomically, by writing a temporary file in the same directory and
+    renaming it into place, so a failed write never leaves the file truncated.
+
+    Args:
+        path (str): The file to write.
+        payload (str): The text content to write.
+    """
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as f:
+        f.write(payload)
+    try:
+        # NamedTemporaryFile creates the file with mode 0600, which os.replace would carry over
+        os.chmod(f.name, _target_mode(path))
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
@@ -12,9 +12,10 @@ def sync_repositories()->List[Repository]:
     ]
     repo_manager = RepoManager(repository_urls=repository_list)
     print("\nCloned Repositories:")
-    for repo in repo_manager.repos:
+    repos = list(repo_manager.repos.values())
+    for repo in repos:
         print(f"- {repo.group_name}/{repo.repo_name} at {repo.repo_path}")
-    return repo_manager.repos
+    return repos
 
 
 def main():
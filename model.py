@@ -1,6 +1,8 @@
 import openai
+import httpx
 from pydantic_core import from_json
 import asyncio
+import random
 from typing import List, Dict, Union
 
 # BASE_URL = "http://100.121.75.10:8000/v1/"
@@ -11,16 +13,24 @@ MODEL = "google/gemini-2.5-flash-preview-05-20"
 
 openai.base_url = BASE_URL
 
-LLM_CLIENT = openai.AsyncOpenAI(base_url=BASE_URL)
+# A single pooled HTTP client shared by all requests, so concurrent calls reuse keep-alive
+# connections instead of opening a new one each time
+HTTP_CLIENT = openai.DefaultAsyncHttpxClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0),
+)
 
-async def get_response(prompt: str, retries: int = 2, delay: int = 1)->Union[List,Dict]:
+LLM_CLIENT = openai.AsyncOpenAI(base_url=BASE_URL, http_client=HTTP_CLIENT)
+
+async def get_response(prompt: str, retries: int = 2, delay: float = 0.25)->Union[List,Dict]:
     """
     Sends a prompt to the LLM client with retry logic.
 
     Args:
         prompt (str): The prompt to send.
         retries (int): The number of times to retry the request.
-        delay (int): The delay in seconds between retries.
+        delay (float): The base delay in seconds between retries. It doubles with every attempt
+                       and a small random jitter is added to spread out retries.
 
     Returns:
         str: The content of the response message.
@@ -42,6 +52,6 @@ async def get_response(prompt: str, retries: int = 2, delay: int = 1)->Union[Lis
         except Exception as e:
             print(f"Attempt {i+1} failed: {e}")
             if i < retries - 1:
-                await asyncio.sleep(delay)
+                await asyncio.sleep(delay * (2 ** i) + random.random() * 0.2)
             else:
                 raise
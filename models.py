@@ -16,34 +16,24 @@ class ExtendedFunctionDescription(BaseFunctionDescription):
         Generates a paragraph-style string representation of the function description,
         suitable for feeding into a vector database.
         """
-        description_parts = []
+        fp = self.filepath
+        function_name = self.function_name
 
         if self.class_name:
-            description_parts.append(
-                f"Within the file '{self.filepath}', the method '{self.function_name}' belonging to the class '{self.class_name}' serves the following purpose:"
-            )
+            intro = f"Within the file '{fp}', the method '{function_name}' belonging to the class '{self.class_name}' serves the following purpose:"
         else:
-            description_parts.append(
-                f"The function '{self.function_name}' located in the file '{self.filepath}' is designed to:"
-            )
-
-        description_parts.append(f"{self.functionality}")
+            intro = f"The function '{function_name}' located in the file '{fp}' is designed to:"
 
         if self.arguments:
-            arg_descriptions = []
-            for arg in self.arguments:
-                arg_descriptions.append(arg.to_paragraph_string())
-            description_parts.append("It accepts the following arguments: " + " ".join(arg_descriptions))
+            arguments = "It accepts the following arguments: " + " ".join(arg.to_paragraph_string() for arg in self.arguments)
         else:
-            description_parts.append("It accepts no arguments.")
+            arguments = "It accepts no arguments."
 
-        description_parts.append(f"The function returns a value of type '{self.return_type}'.")
+        returns = f"The function returns a value of type '{self.return_type}'."
 
         if self.tags:
-            tags_string = ", ".join(self.tags)
-            description_parts.append(f"This function can be categorized by the following tags: {tags_string}.")
-
-        return " ".join(description_parts)
+            return f"{intro} {self.functionality} {arguments} {returns} This function can be categorized by the following tags: {', '.join(self.tags)}."
+        return f"{intro} {self.functionality} {arguments} {returns}"
 
 class ExtendedFileDescription(BaseFileDescription):
     """
@@ -59,34 +49,29 @@ class ExtendedFileDescription(BaseFileDescription):
         Generates a paragraph-style string representation of the file description,
         suitable for feeding into a vector database.
         """
-        description_parts = []
-
-        description_parts.append(f"The file '{self.filepath}' serves the purpose:")
-        description_parts.append(f"{self.overall_purpose_and_domain}")
+        intro = f"The file '{self.filepath}' serves the purpose: {self.overall_purpose_and_domain}"
 
-        formatted_responsibilities = []
-        for i, resp in enumerate(self.primary_responsibilities):
-            # Remove trailing periods if any, to avoid double punctuation when joining
-            cleaned_resp = resp.rstrip('.')
-            if i == 0:
-                formatted_responsibilities.append(cleaned_resp)
-            else:
-                # Lowercase the first letter for subsequent responsibilities to make it flow
-                formatted_responsibilities.append(cleaned_resp[0].lower() + cleaned_resp[1:])
+        # Remove trailing periods if any, to avoid double punctuation when joining, and lowercase the
+        # first letter of every responsibility but the first to make it flow
+        responsibilities = self.primary_responsibilities
+        formatted_responsibilities = [resp.rstrip('.') for resp in responsibilities[:1]]
+        formatted_responsibilities.extend(
+            cleaned_resp[:1].lower() + cleaned_resp[1:]
+            for cleaned_resp in (resp.rstrip('.') for resp in responsibilities[1:])
+        )
 
         if len(formatted_responsibilities) == 1:
             responsibilities_string = formatted_responsibilities[0]
-            description_parts.append(f"Its primary responsibility is to {responsibilities_string.lower() if not responsibilities_string.split(' ')[0].istitle() else responsibilities_string}.")
+            responsibilities_part = f" Its primary responsibility is to {responsibilities_string.lower() if not responsibilities_string.split(' ')[0].istitle() else responsibilities_string}."
         elif len(formatted_responsibilities) > 1:
             # Join all but the last with commas, and the last with 'and'
-            responsibilities_joined = ", ".join(formatted_responsibilities[:-1]) + ", and " + formatted_responsibilities[-1]
-            description_parts.append(f"Its primary responsibilities include: {responsibilities_joined}.")
+            responsibilities_part = f" Its primary responsibilities include: {', '.join(formatted_responsibilities[:-1])}, and {formatted_responsibilities[-1]}."
+        else:
+            responsibilities_part = ""
 
-        if self.tags:
-            tags_string = ", ".join(self.tags)
-            description_parts.append(f"This file is associated with the following keywords or tags: {tags_string}.")
+        tags_part = f" This file is associated with the following keywords or tags: {', '.join(self.tags)}." if self.tags else ""
 
-        return " ".join(description_parts)
+        return f"{intro}{responsibilities_part}{tags_part}"
 
 class AnalysisResults(BaseModel):
     """
@@ -1,15 +1,73 @@
 import os
 import json
 import asyncio
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor
 from model import get_response
 from models import ExtendedFunctionDescription, ExtendedFileDescription, AnalysisResults
-from prompt_templates.file_level import get_function_description_prompt, get_file_description_prompt
+from prompt_templates.file_level import get_function_description_prompt, get_file_description_prompt, get_combined_description_prompt
 from file_reader import read_codefile
 from repository import Repository
 from token_utils import get_file_tokens
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
+# Validates a whole .function.json payload in a single pydantic-core call
+FUNC_LIST_ADAPTER = TypeAdapter(List[ExtendedFunctionDescription])
+FILE_ADAPTER = TypeAdapter(ExtendedFileDescription)
+
+
+def _write_json(path: str, obj) -> None:
+    """
+    Serializes `obj` to an indented JSON string and writes it to `path` in a single call.
+    """
+    payload = json.dumps(obj, indent=2)
+    with open(path, "w") as f:
+        f.write(payload)
+
+async def save_function_descriptions(repo: Repository, filepath: str, function_result: List, output_filepath_base: str):
+    """
+    Validates the function descriptions returned by the agent for a single file and saves them.
+    """
+    validated_results = []
+    for r in function_result:
+        try:
+            validated_r = ExtendedFunctionDescription(
+                file_name=os.path.basename(filepath),
+                filepath=os.path.relpath(filepath, repo.repo_path),
+                repository_url=repo.url,
+                group_name=repo.group_name,
+                repo_name=repo.repo_name,
+                **r
+            )
+            validated_results.append(validated_r.model_dump())
+        except Exception as e:
+            print(f"Error validating function description for file {filepath} with result: {json.dumps(r, indent=2)}. Error: {e}")
+
+
+    await asyncio.to_thread(_write_json, f"{output_filepath_base}.function.json", validated_results)
+
+    print(f"Function analysis result for {filepath} saved to {output_filepath_base}.function.json")
+
+async def save_file_description(repo: Repository, filepath: str, file_result: Dict, output_filepath_base: str):
+    """
+    Validates the file description returned by the agent for a single file and saves it.
+    """
+    try:
+        validated_result = ExtendedFileDescription(
+            file_name=os.path.basename(filepath),
+            filepath=os.path.relpath(filepath, repo.repo_path),
+            repository_url=repo.url,
+            group_name=repo.group_name,
+            repo_name=repo.repo_name,
+            **file_result
+        )
+        validated_result_dict = validated_result.model_dump()
+    except Exception as e:
+        print(f"Error validating file description for file {filepath} with result: {json.dumps(file_result, indent=2)}. Error: {e}")
+
+    await asyncio.to_thread(_write_json, f"{output_filepath_base}.file.json", validated_result_dict)
+
+    print(f"File analysis result for {filepath} saved to {output_filepath_base}.file.json")
 
 async def process_function_description(repo: Repository, filepath: str, code: str, output_filepath_base: str):
     """
@@ -18,27 +76,7 @@ async def process_function_description(repo: Repository, filepath: str, code: st
     function_prompt = get_function_description_prompt(code)
     try:
         function_result = await get_response(prompt=function_prompt)
-
-        validated_results = []
-        for r in function_result:
-            try:
-                validated_r = ExtendedFunctionDescription(
-                    file_name=os.path.basename(filepath),
-                    filepath=os.path.relpath(filepath, repo.repo_path),
-                    repository_url=repo.url,
-                    group_name=repo.group_name,
-                    repo_name=repo.repo_name,
-                    **r
-                )
-                validated_results.append(validated_r.model_dump())
-            except Exception as e:
-                print(f"Error validating function description for file {filepath} with result: {json.dumps(r, indent=2)}. Error: {e}")
-
-
-        with open(f"{output_filepath_base}.function.json", "w") as f:
-            json.dump(validated_results, f, indent=2)
-
-        print(f"Function analysis result for {filepath} saved to {output_filepath_base}.function.json")
+        await save_function_descriptions(repo, filepath, function_result, output_filepath_base)
     except Exception as e:
         print(f"Error processing function description for file {filepath}: {e}")
 
@@ -49,48 +87,75 @@ async def process_file_description(repo: Repository, filepath: str, code: str, o
     file_prompt = get_file_description_prompt(code)
     try:
         file_result = await get_response(prompt=file_prompt)
+        await save_file_description(repo, filepath, file_result, output_filepath_base)
+    except Exception as e:
+        print(f"Error processing file description for file {filepath}: {e}")
 
-        try:
-            validated_result = ExtendedFileDescription(
-                file_name=os.path.basename(filepath),
-                filepath=os.path.relpath(filepath, repo.repo_path),
-                repository_url=repo.url,
-                group_name=repo.group_name,
-                repo_name=repo.repo_name,
-                **file_result
-            )
-            validated_result_dict = validated_result.model_dump()
-        except Exception as e:
-            print(f"Error validating file description for file {filepath} with result: {json.dumps(file_result, indent=2)}. Error: {e}")
+async def process_combined_description(repo: Repository, filepath: str, code: str, output_filepath_base: str):
+    """
+    Processes a single file with one agent call that returns both the file description and the
+    function descriptions, and saves them to their separate JSON files.
+    """
+    combined_prompt = get_combined_description_prompt(code)
+    try:
+        combined_result = await get_response(prompt=combined_prompt)
+    except Exception as e:
+        print(f"Error processing descriptions for file {filepath}: {e}")
+        return
 
-        with open(f"{output_filepath_base}.file.json", "w") as f:
-            json.dump(validated_result_dict, f, indent=2)
+    try:
+        await save_function_descriptions(repo, filepath, combined_result["functions"], output_filepath_base)
+    except Exception as e:
+        print(f"Error processing function description for file {filepath}: {e}")
 
-        print(f"File analysis result for {filepath} saved to {output_filepath_base}.file.json")
+    try:
+        await save_file_description(repo, filepath, combined_result["file"], output_filepath_base)
     except Exception as e:
         print(f"Error processing file description for file {filepath}: {e}")
 
-async def process_file(repo: Repository, filepath: str, code: str, base_output_dir: str, semaphore: asyncio.Semaphore):
+def get_output_filepath_base(repo: Repository, filepath: str, base_output_dir: str) -> str:
+    """
+    Returns the path, without the ".function.json"/".file.json" suffix, under which the analysis
+    results for a source file are saved.
+    """
+    repo_output_dir = os.path.join(base_output_dir, repo.group_name, repo.repo_name)
+    return os.path.join(repo_output_dir, os.path.relpath(filepath, repo.repo_path))
+
+def is_output_up_to_date(filepath: str, output_filepath_base: str) -> bool:
+    """
+    Checks whether both analysis results for a source file exist and are at least as recent as the
+    source file itself.
+    """
+    try:
+        source_mtime = os.path.getmtime(filepath)
+        return all(
+            source_mtime <= os.path.getmtime(f"{output_filepath_base}{suffix}")
+            for suffix in (".function.json", ".file.json")
+        )
+    except OSError:
+        return False
+
+async def process_file(repo: Repository, filepath: str, base_output_dir: str, semaphore: asyncio.Semaphore):
     """
-    Processes a single file by generating prompts for function and file descriptions,
-    running the agent for both, and saving the results to separate JSON files.
-    Uses a semaphore to limit concurrent access.
+    Processes a single file by reading it, generating a combined prompt for function and file
+    descriptions, running the agent once, and saving the results to separate JSON files.
+    Uses a semaphore to limit concurrent access; the file is only read once a slot is acquired.
     """
     async with semaphore:
         print(f"Processing file: {filepath}")
-        repo_output_dir = os.path.join(base_output_dir, repo.group_name, repo.repo_name)
-        output_filepath_base = os.path.join(repo_output_dir, os.path.relpath(filepath, repo.repo_path))
+        code = await asyncio.to_thread(read_codefile, filepath)
+        output_filepath_base = get_output_filepath_base(repo, filepath, base_output_dir)
         os.makedirs(os.path.dirname(output_filepath_base), exist_ok=True)
 
-        await process_function_description(repo, filepath, code, output_filepath_base)
-        await process_file_description(repo, filepath, code, output_filepath_base)
+        await process_combined_description(repo, filepath, code, output_filepath_base)
 
 
-async def process_repo(model_name: str, repo: Repository, token_limit: Optional[int] = None, output_dir: str = "./output", concurrency: int = 50, max_files: Optional[int] = None):
+async def process_repo(model_name: str, repo: Repository, token_limit: Optional[int] = None, output_dir: str = "./output", concurrency: int = 50, max_files: Optional[int] = None, skip_existing: bool = True):
     """
     Processes each source file in a repository in parallel by reading its content, generating prompts,
     and running the code analysis agent for both function and file descriptions. The results are
-    saved as JSON files in the output directory with specific extensions.
+    saved as JSON files in the output directory with specific extensions. Files whose results are
+    already newer than the source file are skipped unless `skip_existing` is False.
 
     Args:
         model_name (str): The name of the pre-trained tokenizer model and the model for the agent.
@@ -99,6 +164,7 @@ async def process_repo(model_name: str, repo: Repository, token_limit: Optional[
         output_dir (str): The base directory where the analysis results will be saved.
         concurrency (int): The maximum number of files to process concurrently.
         max_files (Optional[int]): The maximum number of files to process in the repository.
+        skip_existing (bool): Whether to skip files with up-to-date analysis results.
     """
     file_tokens = get_file_tokens(model_name, repo.repo_path, token_limit)
 
@@ -106,39 +172,63 @@ async def process_repo(model_name: str, repo: Repository, token_limit: Optional[
     tasks = []
     processed_files_count = 0
     total_tokens = 0
+    skipped_files_count = 0
     for filepath in list((file_tokens.keys())):
+        if skip_existing and is_output_up_to_date(filepath, get_output_filepath_base(repo, filepath, output_dir)):
+            skipped_files_count += 1
+            continue
+
         if max_files is not None and processed_files_count >= max_files:
             print(f"Reached maximum number of files to process ({max_files}). Skipping remaining files.")
             break
 
-        code = read_codefile(filepath)
         num_tokens = file_tokens.get(filepath)
         total_tokens += num_tokens
         print(f"File: {filepath} has {num_tokens} tokens")
-        tasks.append(process_file(repo, filepath, code, output_dir, semaphore))
+        tasks.append(process_file(repo, filepath, output_dir, semaphore))
         processed_files_count += 1
 
+    if skipped_files_count:
+        print(f"Skipped {skipped_files_count} files with up-to-date analysis results.")
     print(f"Total input tokens: {total_tokens}")
     await asyncio.gather(*tasks)
 
-def read_output(output_dir: str = "./output") -> AnalysisResults:
+def _load_and_validate(filepath: str) -> Tuple[Optional[str], List[BaseModel]]:
+    """
+    Loads and validates a single analysis output file. Returns the kind of description ("file" or
+    "function") together with the validated objects, or (None, []) if the file is not an analysis
+    result or could not be read.
+    """
+    try:
+        with open(filepath, 'r') as f:
+            data = json.loads(f.read())
+        if filepath.endswith(".file.json"):
+            return "file", [FILE_ADAPTER.validate_python(data)]
+        elif filepath.endswith(".function.json"):
+            return "function", FUNC_LIST_ADAPTER.validate_python(data)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from file {filepath}: {e}")
+    except Exception as e:
+        print(f"Error reading file {filepath}: {e}")
+    return None, []
+
+def read_output(output_dir: str = "./output", max_workers: Optional[int] = None) -> AnalysisResults:
     """
     Reads all JSON files under the specified output directory and returns their content as an
-    AnalysisResults object containing lists for file and function descriptions.
+    AnalysisResults object containing lists for file and function descriptions. Files are loaded
+    and validated concurrently.
     """
+    filepaths = [os.path.join(root, file) for root, _, files in os.walk(output_dir) for file in files]
+    file_descriptions = []
+    function_descriptions = []
+    with ThreadPoolExecutor(max_workers=max_workers or (os.cpu_count() or 4) * 2) as executor:
+        for kind, descriptions in executor.map(_load_and_validate, filepaths):
+            if kind == "file":
+                file_descriptions.extend(descriptions)
+            elif kind == "function":
+                function_descriptions.extend(descriptions)
+
     analysis_results = AnalysisResults()
-    for root, _, files in os.walk(output_dir):
-        for file in files:
-            filepath = os.path.join(root, file)
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    if file.endswith(".file.json"):
-                        analysis_results.file_descriptions.append(ExtendedFileDescription.model_validate(data))
-                    elif file.endswith(".function.json"):
-                        analysis_results.function_descriptions.extend([ExtendedFunctionDescription.model_validate(d) for d in data])
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from file {filepath}: {e}")
-            except Exception as e:
-                print(f"Error reading file {filepath}: {e}")
+    analysis_results.file_descriptions.extend(file_descriptions)
+    analysis_results.function_descriptions.extend(function_descriptions)
     return analysis_results
@@ -1,3 +1,4 @@
+import textwrap
 from .base_template import base_template
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -27,11 +28,9 @@ class FunctionDescription(BaseModel):
 
 
 
-def get_function_description_prompt(code: str)->str:
-    return base_template(
-        task="You are tasked with analyzing the provided code snippet and extracting detailed information about its functions and methods. For every function and method identified, including standalone functions and methods within classes, please provide a comprehensive description by populating the following JSON structure",
-        code=code,
-        json_schema="""
+FUNCTION_DESCRIPTION_TASK = "You are tasked with analyzing the provided code snippet and extracting detailed information about its functions and methods. For every function and method identified, including standalone functions and methods within classes, please provide a comprehensive description by populating the following JSON structure"
+
+FUNCTION_DESCRIPTION_SCHEMA = """
 [
   {
     "function_name": "REQUIRED. String. name of the function/method",
@@ -51,14 +50,11 @@ def get_function_description_prompt(code: str)->str:
   },
   ...
 ]
-""",
-    )
+"""
 
-def get_file_description_prompt(code: str)->str:
-    return base_template(
-        task="You are an expert code analyst LLM. Your task is to provide a comprehensive file-level summary for the provided source code file. Analyze the entire file to understand its overall purpose, structure, dependencies, and key components. Populate the specified JSON output format with detailed and accurate information. This summary should provide a high-level overview, distinct from the granular function-by-function analysis",
-        code=code,
-        json_schema="""
+FILE_DESCRIPTION_TASK = "You are an expert code analyst LLM. Your task is to provide a comprehensive file-level summary for the provided source code file. Analyze the entire file to understand its overall purpose, structure, dependencies, and key components. Populate the specified JSON output format with detailed and accurate information. This summary should provide a high-level overview, distinct from the granular function-by-function analysis"
+
+FILE_DESCRIPTION_SCHEMA = """
 {
   "overall_purpose_and_domain": "REQUIRED. String. In under 1-2 clear and concise sentences, explain the file's primary purpose and the specific problem domain or area it belongs to. Example: 'This file implements a command-line interface (CLI) tool for parsing Apache log files and generating daily traffic reports.' or 'Defines utility functions for common string manipulation tasks, such as cleaning and normalizing text data for an NLP pipeline.'",
   "primary_responsibilities": [
@@ -69,4 +65,38 @@ def get_file_description_prompt(code: str)->str:
   ]
 }
 """
+
+
+def get_function_description_prompt(code: str)->str:
+    return base_template(
+        task=FUNCTION_DESCRIPTION_TASK,
+        code=code,
+        json_schema=FUNCTION_DESCRIPTION_SCHEMA,
+    )
+
+def get_file_description_prompt(code: str)->str:
+    return base_template(
+        task=FILE_DESCRIPTION_TASK,
+        code=code,
+        json_schema=FILE_DESCRIPTION_SCHEMA
+    )
+
+def get_combined_description_prompt(code: str)->str:
+    """
+    Builds a single prompt asking for both the file-level summary and the function descriptions,
+    so the code is only sent once. The response is a JSON object with a "file" key holding the
+    file description and a "functions" key holding the list of function descriptions.
+    """
+    return base_template(
+        task="You are tasked with analyzing the provided code snippet at two levels of detail. "
+             "First, provide a comprehensive file-level summary under the \"file\" key: analyze the entire file to understand its overall purpose, structure, dependencies, and key components. This summary should provide a high-level overview, distinct from the granular function-by-function analysis. "
+             "Second, under the \"functions\" key, extract detailed information about every function and method identified, including standalone functions and methods within classes, and provide a comprehensive description of each. "
+             "Populate the following JSON structure with detailed and accurate information",
+        code=code,
+        json_schema=f"""
+{{
+  "file": {textwrap.indent(FILE_DESCRIPTION_SCHEMA.strip(), "  ").lstrip()},
+  "functions": {textwrap.indent(FUNCTION_DESCRIPTION_SCHEMA.strip(), "  ").lstrip()}
+}}
+""",
     )
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class Repository:
@@ -10,8 +11,11 @@ class Repository:
         group_name (str): The group or organization name.
         repo_name (str): The name of the repository.
         repo_path (str): The local path to the cloned repository.
+        clone_depth (Optional[int]): The history depth the repository was cloned with, or None
+                                     for a full clone. Updates fetch with the same depth.
     """
     url: str
     group_name: str
     repo_name: str
     repo_path: str
+    clone_depth: Optional[int] = None
@@ -1,29 +1,72 @@
 import os
-import git
+import re
+import time
+import asyncio
 import urllib.parse
-from typing import List, Optional
+import dataclasses
+from typing import List, Optional, Tuple, Dict, Iterable
 from repository import Repository
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from async_utils import run_sync
+from file_utils import atomic_write
+from concurrent.futures import ThreadPoolExecutor
 import json
 import requests
-from pick import pick
+
+# Extracts the last two path components of a repository URL (group and repository name, without a
+# trailing .git). The scheme and host are matched possessively so they are never taken as the group.
+_REPO_URL_RE = re.compile(r"^(?:[A-Za-z][A-Za-z0-9+.-]*://[^/]*)?+/?(?:[^?#]*/)?([^/?#]+)/([^/?#]+?)(?:\.git)?/?(?:[?#].*)?$")
+
+# Parsed repository metadata keyed by (absolute metadata file path, st_mtime_ns)
+_META_CACHE: Dict[Tuple[str, int], List[Repository]] = {}
+
+def _choose_workers(n_urls: int) -> int:
+    """
+    Chooses how many clones/pulls to run at once. These tasks are mostly network bound, so this can
+    be several times larger than the CPU count, but never larger than the number of URLs.
+    """
+    return max(1, min(n_urls, 32, (os.cpu_count() or 4) * 4))
+
+async def _run_git(*args: str) -> str:
+    """
+    Runs a git command as an asyncio subprocess, so many git processes can run concurrently
+    without tying up a thread each.
+
+    Returns:
+        str: The standard output of the command.
+
+    Raises:
+        RuntimeError: If git exits with a non-zero status.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "git", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {stderr.decode().strip()}")
+    return stdout.decode()
+
+def _depth_args(clone_depth: Optional[int]) -> List[str]:
+    return [f"--depth={clone_depth}"] if clone_depth else []
 
 class RepoManager:
     """
     Manages cloning and updating git repositories.
     """
-    def __init__(self, data_dir: str = "./data", repository_urls: List[str] = [], group_url: str = None):
+    def __init__(self, data_dir: str = "./data", repository_urls: List[str] = [], group_url: str = None, clone_depth: Optional[int] = 1):
         """
         Initializes the RepoManager and syncs the provided repositories.
 
         Args:
             data_dir (str): The base directory for cloning repositories.
             repository_urls (List[str]): A list of git repository URLs to sync.
+            clone_depth (Optional[int]): The history depth for new clones, or None for full clones.
+                                         Shallow clones also skip the blobs of older revisions.
         """
         self.data_dir = data_dir
+        self.clone_depth = clone_depth
         os.makedirs(self.data_dir, exist_ok=True)
         self.metadata_file = os.path.join(self.data_dir, "repos_metadata.json")
-        self.repos: List[Repository] = self._load_metadata()
+        self.repos: Dict[str, Repository] = self._load_metadata()
 
         group_urls = []
         if group_url:
@@ -33,33 +76,42 @@ class RepoManager:
 
 
         # Combine URLs from metadata and provided URLs, removing duplicates
-        all_urls = list(set([repo.url for repo in self.repos] + repository_urls + group_urls))
+        all_urls = list(dict.fromkeys([*self.repos, *repository_urls, *group_urls]))
 
         if all_urls:
             self.sync_repositories(all_urls)
 
 
-    def _load_metadata(self) -> List[Repository]:
+    def _load_metadata(self) -> Dict[str, Repository]:
         """
-        Loads repository metadata from the JSON file.
+        Loads repository metadata from the JSON file. Parsed metadata is cached per file and
+        modification time, so other RepoManager instances in the same process reuse it; each
+        instance gets its own copies of the cached Repository objects.
 
         Returns:
-            List[Repository]: A list of Repository dataclass objects.
+            Dict[str, Repository]: Repository dataclass objects keyed by their URL.
         """
         if os.path.exists(self.metadata_file):
             try:
-                with open(self.metadata_file, "r") as f:
-                    metadata = json.load(f)
-                    return [Repository(**repo_data) for repo_data in metadata]
+                key = (os.path.abspath(self.metadata_file), os.stat(self.metadata_file).st_mtime_ns)
+                repos = _META_CACHE.get(key)
+                if repos is None:
+                    with open(self.metadata_file, "r") as f:
+                        metadata = json.load(f)
+                    repos = [Repository(**repo_data) for repo_data in metadata]
+                    _META_CACHE[key] = repos
+                return {repo.url: dataclasses.replace(repo) for repo in repos}
             except (json.JSONDecodeError, FileNotFoundError) as e:
                 print(f"Error loading repository metadata from {self.metadata_file}: {e}")
-                return []
-        return []
+                return {}
+        return {}
 
 
-    def _clone_or_pull_repository(self, url: str) -> Optional[Repository]:
+    async def _clone_or_pull_repository(self, url: str) -> Optional[Repository]:
         """
-        Clones a single repository or pulls updates if it already exists.
+        Clones a single repository or pulls updates if it already exists. New repositories are cloned
+        with the manager's `clone_depth`; existing ones fetch with the depth they were cloned with, as
+        recorded in the metadata, and reset to the fetched upstream branch.
 
         Args:
             url (str): The URL of the repository.
@@ -67,81 +119,214 @@ class RepoManager:
         Returns:
             Optional[Repository]: A Repository dataclass object if successful, None otherwise.
         """
-        parsed_url = urllib.parse.urlparse(url)
-        path_parts = parsed_url.path.strip('/').split('/')
-        if len(path_parts) < 2:
+        match = _REPO_URL_RE.match(url)
+        if not match:
             print(f"Skipping invalid repository URL: {url}")
             return None
 
-        group_name = path_parts[-2]
-        repo_name = path_parts[-1].replace('.git', '')
+        group_name, repo_name = match.group(1), match.group(2)
         repo_path = os.path.join(self.data_dir, group_name, repo_name)
 
         if os.path.exists(repo_path):
             print(f"Repository already exists: {group_name}/{repo_name}. Performing git pull...")
+            existing_repo = self.repos.get(url)
+            clone_depth = existing_repo.clone_depth if existing_repo else None
             try:
-                repo = git.Repo(repo_path)
-                origin = repo.remotes.origin
-                origin.pull()
+                # ls-remote is a tiny exchange compared to a fetch, so check whether anything changed first.
+                # The local rev-parse runs while the remote round-trip is in flight.
+                remote_output, local_output = await asyncio.gather(
+                    _run_git("-C", repo_path, "ls-remote", "origin", "HEAD"),
+                    _run_git("-C", repo_path, "rev-parse", "HEAD"),
+                )
+                remote_head = remote_output.split()
+                if remote_head and remote_head[0] == local_output.strip():
+                    print(f"Repository {group_name}/{repo_name} is already up to date")
+                    return Repository(url=url, group_name=group_name, repo_name=repo_name, repo_path=repo_path, clone_depth=clone_depth)
+
+                await _run_git("-C", repo_path, "fetch", *_depth_args(clone_depth), "--prune", "origin")
+                await _run_git("-C", repo_path, "reset", "--hard", "@{upstream}")
                 print(f"Successfully pulled latest changes for {group_name}/{repo_name}")
-                return Repository(url=url, group_name=group_name, repo_name=repo_name, repo_path=repo_path)
+                return Repository(url=url, group_name=group_name, repo_name=repo_name, repo_path=repo_path, clone_depth=clone_depth)
             except Exception as e:
                 print(f"Error pulling changes for {group_name}/{repo_name}: {e}")
                 return None
         else:
             print(f"Cloning {group_name}/{repo_name} from {url}...")
             try:
-                git.Repo.clone_from(url, repo_path)
+                shallow_args = [*_depth_args(self.clone_depth), "--filter=blob:none", "--single-branch"] if self.clone_depth else []
+                await _run_git("clone", *shallow_args, url, repo_path)
                 print(f"Successfully cloned {group_name}/{repo_name}")
-                return Repository(url=url, group_name=group_name, repo_name=repo_name, repo_path=repo_path)
+                return Repository(url=url, group_name=group_name, repo_name=repo_name, repo_path=repo_path, clone_depth=self.clone_depth)
             except Exception as e:
                 print(f"Error cloning {group_name}/{repo_name}: {e}")
                 return None
 
-    def sync_repositories(self, repository_urls: List[str], max_workers: int = 5) -> List[Repository]:
+    def sync_repositories(self, repository_urls: List[str], max_workers: Optional[int] = None) -> List[Repository]:
         """
         Clones a list of git repositories into the ./data directory concurrently.
         If a repository already exists, it performs a git pull to update it.
 
         Args:
             repository_urls (List[str]): A list of git repository URLs.
-            max_workers (int): The maximum number of threads to use for cloning.
+            max_workers (Optional[int]): The maximum number of git processes to run at once. Defaults to
+                                         a value based on the CPU count and the number of URLs.
 
         Returns:
             List[Repository]: A list of Repository dataclass objects for the cloned repositories.
         """
-        synced_repos: List[Repository] = []
+        if max_workers is None:
+            max_workers = _choose_workers(len(repository_urls))
+        synced_repos = run_sync(self._sync_repositories_async(repository_urls, max_workers))
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {executor.submit(self._clone_or_pull_repository, url): url for url in repository_urls}
-            for future in as_completed(future_to_url):
-                repo = future.result()
-                if repo:
-                    synced_repos.append(repo)
-
-        # Update the internal list of repositories
-        synced_urls = {repo.url for repo in synced_repos}
-        existing_repos = [repo for repo in self.repos if repo.url not in synced_urls]
-        self.repos = existing_repos + synced_repos
-
-        self.write_metadata(self.repos)
+        # Update the internal mapping of repositories
+        self.repos.update({repo.url: repo for repo in synced_repos})
+
+        self.write_metadata(self.repos.values())
         return synced_repos
 
-    def write_metadata(self, repos: List[Repository]):
+    async def _sync_repositories_async(self, repository_urls: List[str], max_workers: int) -> List[Repository]:
+        """
+        Clones or pulls all repositories concurrently, running at most `max_workers` at a time.
         """
-        Writes the metadata of cloned repositories to a JSON file.
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def sync_one(url: str) -> Optional[Repository]:
+            async with semaphore:
+                return await self._clone_or_pull_repository(url)
+
+        results = await asyncio.gather(*(sync_one(url) for url in repository_urls))
+        return [repo for repo in results if repo]
+
+    def write_metadata(self, repos: Iterable[Repository]):
+        """
+        Writes the metadata of cloned repositories to a JSON file. The file is only rewritten if its
+        content changes, and is replaced atomically so a failed write never leaves it truncated.
 
         Args:
-            repos (List[Repository]): A list of Repository dataclass objects.
+            repos (Iterable[Repository]): The Repository dataclass objects to write.
         """
         metadata = [repo.__dict__ for repo in repos]
-        with open(self.metadata_file, "w") as f:
-            json.dump(metadata, f, indent=2)
+        payload = json.dumps(metadata, indent=2)
+        try:
+            with open(self.metadata_file, "r") as f:
+                if f.read() == payload:
+                    print(f"Repository metadata in {self.metadata_file} is unchanged")
+                    return
+        except FileNotFoundError:
+            pass
+
+        atomic_write(self.metadata_file, payload)
+        metadata_path = os.path.abspath(self.metadata_file)
+        for key in [key for key in _META_CACHE if key[0] == metadata_path]:
+            del _META_CACHE[key]
         print(f"Repository metadata written to {self.metadata_file}")
 
+def _get_with_rate_limit(session: requests.Session, api_url: str, params: dict) -> requests.Response:
+    """
+    Performs a GET request and, if the API reports an exhausted rate limit, waits until the limit
+    resets and retries once.
+    """
+    response = session.get(api_url, params=params)
+    remaining = response.headers.get("X-RateLimit-Remaining", response.headers.get("RateLimit-Remaining"))
+    if response.status_code in (403, 429) and remaining == "0":
+        reset = response.headers.get("X-RateLimit-Reset", response.headers.get("RateLimit-Reset", "0"))
+        wait = max(0.0, int(reset) - time.time()) + 1
+        print(f"Rate limit reached, waiting {wait:.0f} seconds before retrying...")
+        time.sleep(wait)
+        response = session.get(api_url, params=params)
+    return response
+
+def _last_page(response: requests.Response) -> Optional[int]:
+    """
+    Determines the number of the last page from the pagination headers of the first page
+    (X-Total-Pages on GitLab, the Link header on GitHub). Returns None if it cannot be determined.
+    """
+    total_pages = response.headers.get("X-Total-Pages")
+    if total_pages:
+        return int(total_pages)
+    if "last" in response.links:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(response.links["last"]["url"]).query)
+        return int(query["page"][0])
+    if "next" not in response.links and not response.headers.get("X-Next-Page"):
+        return 1
+    return None
+
+def _fetch_paginated(session: requests.Session, api_url: str, params: dict, url_key: str, platform: str, max_workers: int = 8) -> List[str]:
+    """
+    Fetches all pages of a repository listing. The first page is fetched on its own to learn the page
+    count, the remaining pages are then fetched concurrently. If the page count is unknown, pages are
+    walked one by one until an empty page is returned.
+    """
+    def fetch_page(page: int) -> Tuple[Optional[List[str]], requests.Response]:
+        response = _get_with_rate_limit(session, api_url, {**params, 'page': page})
+        if response.status_code != 200:
+            print(f"Error fetching {platform} repositories: {response.status_code}")
+            return None, response
+        return [repo[url_key] for repo in response.json()], response
+
+    repo_urls, response = fetch_page(1)
+    if not repo_urls:
+        return []
+
+    last_page = _last_page(response)
+    if last_page is not None:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page_urls, _ in executor.map(fetch_page, range(2, last_page + 1)):
+                if page_urls:
+                    repo_urls.extend(page_urls)
+    else:
+        page = 2
+        while True:
+            page_urls, _ = fetch_page(page)
+            if not page_urls:
+                break
+            repo_urls.extend(page_urls)
+            page += 1
+    return repo_urls
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+GITHUB_ORG_REPOS_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { endCursor hasNextPage }
+      nodes { url }
+    }
+  }
+}
+"""
+
+def _fetch_github_repos_graphql(session: requests.Session, org_name: str) -> List[str]:
+    """
+    Fetches the clone URLs of all repositories of a GitHub organization through the GraphQL API,
+    which returns only the fields needed and follows cursors instead of page numbers. The GraphQL
+    API requires an authenticated session.
+    """
+    repo_urls = []
+    cursor = None
+    while True:
+        response = session.post(GITHUB_GRAPHQL_URL, json={"query": GITHUB_ORG_REPOS_QUERY, "variables": {"org": org_name, "cursor": cursor}})
+        if response.status_code != 200:
+            print(f"Error fetching GitHub repositories: {response.status_code}")
+            break
+        payload = response.json()
+        if payload.get("errors") or not (payload.get("data") or {}).get("organization"):
+            print(f"Error fetching GitHub repositories: {payload.get('errors')}")
+            break
+        repositories = payload["data"]["organization"]["repositories"]
+        # Match the REST API's clone_url so URLs stay comparable with stored metadata
+        repo_urls.extend(f"{node['url']}.git" for node in repositories["nodes"])
+        if not repositories["pageInfo"]["hasNextPage"]:
+            break
+        cursor = repositories["pageInfo"]["endCursor"]
+    return repo_urls
+
 def fetch_repos_under_group(url: str) -> List[str]:
     """
-    Fetches all repository URLs under a given GitLab or GitHub group URL.
+    Fetches all repository URLs under a given GitLab or GitHub group URL. A single HTTP session is
+    reused for all requests and pages after the first are fetched concurrently. For GitHub, if the
+    GITHUB_TOKEN environment variable is set, the GraphQL API is used instead of the REST API.
 
     Args:
         url (str): The URL of the group (e.g., https://gitlab.com/my-group or https://github.com/my-org).
@@ -155,45 +340,29 @@ def fetch_repos_under_group(url: str) -> List[str]:
 
     repo_urls = []
 
-    if "github.com" in hostname:
-        if len(path_parts) < 1:
-            print(f"Invalid GitHub group URL: {url}")
-            return []
-        org_name = path_parts[0]
-        api_url = f"https://api.github.com/orgs/{org_name}/repos"
-        page = 1
-        while True:
-            response = requests.get(api_url, params={'page': page, 'per_page': 100, 'sort': 'updated'})
-            if response.status_code != 200:
-                print(f"Error fetching GitHub repositories: {response.status_code}")
-                break
-            repos_data = response.json()
-            if not repos_data:
-                break
-            for repo in repos_data:
-                repo_urls.append(repo['clone_url'])
-            page += 1
-
-    elif "gitlab.com" in hostname:
-        if len(path_parts) < 1:
-            print(f"Invalid GitLab group URL: {url}")
-            return []
-        group_path = '/'.join(path_parts)
-        api_url = f"https://gitlab.com/api/v4/groups/{urllib.parse.quote_plus(group_path)}/projects"
-        page = 1
-        while True:
-            response = requests.get(api_url, params={'page': page, 'per_page': 100})
-            if response.status_code != 200:
-                print(f"Error fetching GitLab repositories: {response.status_code}")
-                break
-            repos_data = response.json()
-            if not repos_data:
-                break
-            for repo in repos_data:
-                repo_urls.append(repo['http_url_to_repo'])
-            page += 1
-    else:
-        print(f"Unsupported hosting platform for URL: {url}")
+    with requests.Session() as session:
+        if "github.com" in hostname:
+            if len(path_parts) < 1:
+                print(f"Invalid GitHub group URL: {url}")
+                return []
+            org_name = path_parts[0]
+            github_token = os.environ.get("GITHUB_TOKEN")
+            if github_token:
+                session.headers["Authorization"] = f"Bearer {github_token}"
+                repo_urls = _fetch_github_repos_graphql(session, org_name)
+            else:
+                api_url = f"https://api.github.com/orgs/{org_name}/repos"
+                repo_urls = _fetch_paginated(session, api_url, {'per_page': 100, 'sort': 'updated'}, 'clone_url', "GitHub")
+
+        elif "gitlab.com" in hostname:
+            if len(path_parts) < 1:
+                print(f"Invalid GitLab group URL: {url}")
+                return []
+            group_path = '/'.join(path_parts)
+            api_url = f"https://gitlab.com/api/v4/groups/{urllib.parse.quote_plus(group_path)}/projects"
+            repo_urls = _fetch_paginated(session, api_url, {'per_page': 100}, 'http_url_to_repo', "GitLab")
+        else:
+            print(f"Unsupported hosting platform for URL: {url}")
 
     return repo_urls
 
@@ -213,6 +382,9 @@ def filter_repos_according_to_user(repo_urls: List[str]) -> List[str]:
     title = 'Select repositories to include (Space to toggle, Enter to confirm):'
     options = repo_urls
 
+    # Imported here so the interactive picker is only loaded when a group is being filtered
+    from pick import pick
+
     selected_options = pick(options, title, multiselect=True, min_selection_count=0)
 
     return [option for option, index in selected_options]
@@ -1,28 +1,130 @@
-from transformers import AutoTokenizer
-from file_reader import read_source_files, read_codefile
+import os
+import json
+import heapq
+import operator
+from file_reader import iter_source_files, read_codefile
+from file_utils import atomic_write
 from typing import Dict, Tuple, List, Optional
 from repository import Repository
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def get_file_tokens(model_name: str, repo_path: str, token_limit: Optional[int] = None) -> Dict[str, int]:
+# Let the Rust tokenizer backend parallelize batch encoding
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+TOKENIZE_BATCH_SIZE = 64
+
+# Source code averages well under this many bytes per token, so a file larger than
+# token_limit * MAX_BYTES_PER_TOKEN is skipped without being read or tokenized
+MAX_BYTES_PER_TOKEN = 8
+
+TOKEN_CACHE_FILE = "./data/token_cache.json"
+
+@lru_cache(maxsize=4)
+def _get_tokenizer(model_name: str):
+    """
+    Loads the fast (Rust-backed) tokenizer for a model once and reuses it for subsequent calls.
+    transformers is imported here so that importing this module stays cheap.
+    """
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+def _load_token_cache(cache_file: str) -> Dict[str, Dict[str, List[int]]]:
+    """
+    Loads the token count cache, which maps model name -> file path -> [mtime_ns, size, num_tokens].
+    """
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error loading token cache from {cache_file}: {e}")
+    return {}
+
+def _write_token_cache(cache: Dict[str, Dict[str, List[int]]], cache_file: str):
     """
-    Reads source files from a repository, tokenizes their content using a specified model,
-    and returns a dictionary mapping file paths to their token counts.
+    Atomically writes the token count cache, creating its directory if needed.
+    """
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    atomic_write(cache_file, json.dumps(cache))
+
+def _read_and_tokenize(tokenizer, batch: List[Tuple[str, List[int]]]) -> List[int]:
+    """
+    Reads a batch of files and returns their token counts, in the same order.
+    """
+    codes = [read_codefile(sourcefilename) for sourcefilename, _ in batch]
+    return tokenizer(
+        codes,
+        add_special_tokens=False,
+        return_length=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )["length"]
+
+def get_file_tokens(model_name: str, repo_path: str, token_limit: Optional[int] = None, cache_file: Optional[str] = TOKEN_CACHE_FILE, max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Reads source files from a repository, tokenizes their content in batches using a specified model,
+    and returns a dictionary mapping file paths to their token counts. Token counts are cached on disk
+    keyed by file modification time and size, so unchanged files are not tokenized again. Files that
+    are too large to fit within `token_limit` are skipped based on their size alone.
 
     Args:
         model_name (str): The name of the pre-trained tokenizer model to use.
         repo_path (str): The path to the code repository.
         token_limit (Optional[int]): The maximum number of tokens allowed per file. Files
                                      exceeding this limit or having zero tokens will be excluded.
+        cache_file (Optional[str]): The path of the token count cache, or None to disable caching.
+        max_workers (Optional[int]): The number of threads used for reading and tokenizing files.
+                                     Defaults to the number of CPUs.
 
     Returns:
         Dict[str, int]: A dictionary where keys are file paths and values are token counts
                         for files within the specified token limit and with non-zero tokens.
     """
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    cache = _load_token_cache(cache_file) if cache_file else {}
+    model_cache = cache.setdefault(model_name, {})
+
+    source_files: List[str] = []
+    all_file_tokens: Dict[str, int] = {}
+    stale_batch: List[Tuple[str, List[int]]] = []
+    future_to_batch = {}
+    # Walk the tree lazily and hand each full batch of stale files to the pool right away, so reading
+    # and tokenizing overlap with directory traversal. The fast tokenizer releases the GIL while
+    # encoding, so batches are read and tokenized in parallel.
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        for sourcefilename in iter_source_files(repo_path):
+            source_files.append(sourcefilename)
+            st = os.stat(sourcefilename)
+            if token_limit is not None and st.st_size > token_limit * MAX_BYTES_PER_TOKEN:
+                print(f"Skipping file {sourcefilename} of {st.st_size} bytes, too large to fit the limit of {token_limit} tokens.")
+                continue
+            key = [st.st_mtime_ns, st.st_size]
+            cached = model_cache.get(sourcefilename)
+            if cached is not None and cached[:2] == key:
+                all_file_tokens[sourcefilename] = cached[2]
+                continue
+            stale_batch.append((sourcefilename, key))
+            if len(stale_batch) == TOKENIZE_BATCH_SIZE:
+                future_to_batch[executor.submit(_read_and_tokenize, _get_tokenizer(model_name), stale_batch)] = stale_batch
+                stale_batch = []
+        if stale_batch:
+            future_to_batch[executor.submit(_read_and_tokenize, _get_tokenizer(model_name), stale_batch)] = stale_batch
+
+        for future in as_completed(future_to_batch):
+            batch = future_to_batch[future]
+            for (sourcefilename, key), num_tokens in zip(batch, future.result()):
+                all_file_tokens[sourcefilename] = num_tokens
+                model_cache[sourcefilename] = key + [num_tokens]
+
+    if future_to_batch and cache_file:
+        _write_token_cache(cache, cache_file)
+
     file_tokens: Dict[str, int] = {}
-    for sourcefilename in read_source_files(repo_path).source_files:
-        code = read_codefile(sourcefilename)
-        num_tokens = len(tokenizer.encode(code))
+    for sourcefilename in source_files:
+        num_tokens = all_file_tokens.get(sourcefilename)
+        if num_tokens is None:
+            continue
         if num_tokens == 0:
             print(f"Skipping file {sourcefilename} as it has zero tokens.")
             continue
@@ -32,7 +134,7 @@ def get_file_tokens(model_name: str, repo_path: str, token_limit: Optional[int]
         file_tokens[sourcefilename] = num_tokens
     return file_tokens
 
-def print_file_tokens(model_name: str, repo: Repository, token_limit: Optional[int] = None):
+def print_file_tokens(model_name: str, repo: Repository, token_limit: Optional[int] = None, top_k: Optional[int] = None):
     """
     Prints file paths and their token counts, sorted by token count in descending order,
     and also prints the total token count.
@@ -41,14 +143,19 @@ def print_file_tokens(model_name: str, repo: Repository, token_limit: Optional[i
         model_name (str): The name of the pre-trained tokenizer model to use.
         repo (Repository): The Repository object representing the code repository.
         token_limit (Optional[int]): The maximum number of tokens allowed per file for filtering.
+        top_k (Optional[int]): If set, only the top_k largest files are printed. The total still
+            covers every file.
     """
     file_tokens = get_file_tokens(model_name, repo.repo_path, token_limit)
-    source_files_with_tokens: List[Tuple[str, int]] = list(file_tokens.items())
 
     total_tokens = sum(file_tokens.values())
 
-    # Sort in descending order of num_tokens
-    source_files_with_tokens.sort(key=lambda item: item[1], reverse=True)
+    # Descending order of num_tokens; a heap avoids sorting every file when only the top few are shown
+    source_files_with_tokens: List[Tuple[str, int]]
+    if top_k is not None:
+        source_files_with_tokens = heapq.nlargest(top_k, file_tokens.items(), key=operator.itemgetter(1))
+    else:
+        source_files_with_tokens = sorted(file_tokens.items(), key=operator.itemgetter(1), reverse=True)
 
     print(f"\nToken counts for repository: {repo.group_name}/{repo.repo_name}")
     for sourcefilename, num_tokens in source_files_with_tokens: